@@ -1,38 +1,115 @@
-import construct
+import mmap
+import os
+import struct
+from collections import namedtuple
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
+try:
+    from numba import njit
+    _HAVE_NUMBA = True
+except ImportError:
+    _HAVE_NUMBA = False
+
+_U32 = struct.Struct('<I')
+_I32 = struct.Struct('<i')
+
+# ByteOrder and FileType words following the magic number; only their low
+# 16 bits are used.
+_FILE_PREAMBLE = struct.Struct('<h2xh2x')
+
+_ZONE_FIXED = struct.Struct('<IIdIII')
+_ZONE_FIXED_FIELDS = ('ParentZone', 'StrandID', 'SolutionTime', 'NotUsed',
+                      'ZoneType', 'VarLoc')
+# Layout after VarLoc(s) for ordered zones (ZoneType 0) and all FE types.
+# RawFaceNeighbors is listed twice in the FE layout on purpose: the original
+# reader parsed the third word into it as well, so the later value wins.
+_ORDERED_ZONE_TAIL = (struct.Struct('<IIIIII'),
+                      ('RawFaceNeighbors', 'UserdefinedFaceNeighbors',
+                       'Imax', 'Jmax', 'Kmax', 'AuxdataNamePair'))
+_FE_ZONE_TAIL = (struct.Struct('<IIII'),
+                 ('RawFaceNeighbors', 'UserdefinedFaceNeighbors',
+                  'RawFaceNeighbors', 'AuxdataNamePair'))
+_ZONE_TAILS = {0: _ORDERED_ZONE_TAIL}
+
+TecStr = namedtuple('TecStr', ['correct', 's', 'end'])
+
+_TEC_CHARS = [chr(i) for i in range(256)]
+_END_TECSTR = TecStr(True, '', True)
+_INVALID_TECSTR = TecStr(False, '', False)
+
+_ZONE_MARKER = np.float32(299.0)
+_EOH_MARKER = np.float32(357.0)
+_SCAN_CHUNK = 1 << 20
+_TITLE_WINDOW = 64
+_READ_CHUNK = 64 << 20
+
+if _HAVE_NUMBA:
+    @njit(cache=True)
+    def _find_markers_jit(buf, marker_bits, max_count):
+        found = np.empty(max_count, np.int64)
+        count = 0
+        for i in range(0, buf.size - 3, 4):
+            if count == max_count:
+                break
+            word = (np.int64(buf[i]) | (np.int64(buf[i+1]) << 8)
+                    | (np.int64(buf[i+2]) << 16) | (np.int64(buf[i+3]) << 24))
+            if word == marker_bits:
+                found[count] = i
+                count = count + 1
+        return found[:count]
+
+    @njit(cache=True)
+    def _find_str_end_jit(buf, start):
+        for i in range(start, buf.size - 3, 4):
+            if buf[i] == 0 and buf[i+1] == 0 and buf[i+2] == 0 and buf[i+3] == 0:
+                return i
+        return -1
+
+
+def _find_markers(byte_list, marker, max_count, num_words):
+    # Byte offsets of the first max_count words equal to marker within the
+    # first num_words 32 bit words of byte_list.
+    if _HAVE_NUMBA:
+        buf = np.frombuffer(byte_list, dtype=np.uint8, count=4 * num_words)
+        marker_bits = int(np.float32(marker).view('<u4'))
+        return _find_markers_jit(buf, marker_bits, max_count).tolist()
+
+    # Without numba scan in chunks so we stop once enough markers are found
+    # instead of comparing every word of the (possibly huge) buffer.
+    markers = list()
+    first_word = 0
+    while len(markers) < max_count and first_word < num_words:
+        count = min(_SCAN_CHUNK, num_words - first_word)
+        words = np.frombuffer(byte_list, dtype='<f4', count=count,
+                              offset=first_word * 4)
+        found = np.flatnonzero(words == marker) + first_word
+        markers.extend((found * 4).tolist())
+        first_word = first_word + count
+    return markers[:max_count]
+
+
 def read_tec_str(byte_list):
+    # One 32 bit Tecplot character; the end and error results are shared
+    # singletons so no object is allocated for them.
     if not len(byte_list) == 4:
-        return {'Correct' : False}
+        return _INVALID_TECSTR
 
-    check = construct.Int32ul.parse(byte_list)
-    if not check == 0:
-        return {'Correct':True, 'str': chr(byte_list[0]), 'End':False}
-    return {'Correct':True, 'str': '','End':True}
+    if byte_list[0] or byte_list[1] or byte_list[2] or byte_list[3]:
+        return TecStr(True, _TEC_CHARS[byte_list[0]], False)
+    return _END_TECSTR
 
 
 def construct_qword(byte_list):
     if len(byte_list) < 8:
         return  {'Correct':False}
-    qword=0
-    uni_chars=''
-
-    tec_str = ''
-    first = read_tec_str(byte_list[0:4])
-    second = read_tec_str(byte_list[4:8])
-    if first['Correct']:
-        tec_str=tec_str+first['str']
-    if second['Correct']:
-        tec_str=tec_str+second['str']
-
-
-    for i in range(8):
-        shiftval=(7-1*i)*8
-        qword=qword + (byte_list[i] << shiftval)
-        uni_chars=uni_chars+str(chr(byte_list[i]))
-
-    lei32=construct.Int32sl.parse(byte_list)
-
+    # The two Tecplot characters are the first byte of each word; a zero
+    # word is a terminator and contributes nothing.
+    tec_str = bytes(byte_list[0:8:4]).decode('latin-1').replace('\x00', '')
+    qword = int.from_bytes(byte_list[0:8], 'big')
+    uni_chars = bytes(byte_list[0:8]).decode('latin-1')
+    lei32 = _I32.unpack_from(byte_list, 0)[0]
 
     return {'Correct':True, 'qword':qword,'I32ul':lei32,
             'uni_chars':uni_chars, 'tec_str':tec_str}
@@ -45,39 +122,43 @@ def read_magic_number(byte_list):
     return magic_num
 
 
+def _find_str_end(mv, offset):
+    # Byte offset of the zero word that ends the string at offset, or -1.
+    if _HAVE_NUMBA:
+        return _find_str_end_jit(np.frombuffer(mv, dtype=np.uint8), offset)
+
+    # Strings are short, so look at a small window first and grow it rather
+    # than comparing the whole rest of the buffer.
+    num_words = (len(mv) - offset) // 4
+    window = _TITLE_WINDOW
+    first_word = 0
+    while first_word < num_words:
+        count = min(window, num_words - first_word)
+        words = np.frombuffer(mv, dtype='<u4', count=count,
+                              offset=offset + 4 * first_word)
+        ends = np.flatnonzero(words == 0)
+        if ends.size:
+            return offset + 4 * (first_word + int(ends[0]))
+        first_word = first_word + count
+        window = window * 2
+    return -1
+
 def get_title(byte_list, offset=0):
-    title = ''
-    title_end = False
-    counter = 0
-    next_rel_byte = 0
-    while not title_end:
-        first_rel_byte = counter * 8
-        next_rel_byte = (counter + 1) * 8
-        first = read_tec_str(byte_list[first_rel_byte:first_rel_byte+4])
-        second = read_tec_str(byte_list[first_rel_byte+4:first_rel_byte + 8])
-        if not first['Correct']:
-            return {'Correct':False}
-        if not second['Correct']:
-            return {'Correct':False}
-        if first['End']:
-            title_end = True
-            next_rel_byte = first_rel_byte+4
-            continue
-        title = title + first['str']
-        if second['End']:
-            title_end = True
-            next_rel_byte = first_rel_byte+8
-            continue
-        title = title + second['str']
-        counter = counter+1
-
-    return {'Correct':True,'title':title,'next_byte':next_rel_byte}
-
-def read_var_names(byte_list, num_vars):
+    # Tecplot strings store one character per 32 bit word and end with a
+    # zero word, so only the first byte of each word is kept.
+    mv = memoryview(byte_list)
+    end = _find_str_end(mv, offset)
+    if end < 0:
+        return {'Correct':False}
+    return {'Correct':True,'title':bytes(mv[offset:end:4]).decode('latin-1'),
+            'next_byte':end + 4 - offset}
+
+def read_var_names(byte_list, num_vars, offset=0):
+    mv = memoryview(byte_list)
     var_names = list()
     next_byte=0
     for i in range(num_vars):
-        qword = get_title(byte_list[next_byte:])
+        qword = get_title(mv, offset + next_byte)
         if not qword['Correct']:
             return {'Correct':False}
         var_names.append(qword['title'])
@@ -87,173 +168,73 @@ def read_var_names(byte_list, num_vars):
     return var_names, next_byte
 
 
-def parse_zone(byte_list, num_vars):
-    FeZone = lambda x: x>0
-
+def parse_zone(byte_list, num_vars, offset=0):
     zone={}
-    zone_name = get_title(byte_list)
+    zone_name = get_title(byte_list, offset)
     if zone_name['Correct']==False:
         return {'Correct':False}
 
     zone['ZoneName'] =  zone_name['title']
 
-    byte_start = zone_name['next_byte']
-    byte_end = zone_name['next_byte']+4
-
-    zone['ParentZone']= construct.Int32ul.parse(
-        byte_list[byte_start:byte_end])
-
-    byte_start = byte_start+4
-    byte_end = byte_end + 4
-
-    zone['StrandID'] = construct.Int32ul.parse(
-        byte_list[byte_start:byte_end])
+    byte_start = offset + zone_name['next_byte']
 
-    byte_start = byte_end
-    byte_end = byte_end + 8
-
-    zone['SolutionTime'] = construct.Float64l.parse(
-        byte_list[byte_start:byte_end])
-
-    byte_start = byte_end
-    byte_end = byte_end + 4
-
-    zone['NotUsed'] = construct.Int32ul.parse(
-        byte_list[byte_start:byte_end])
-
-    byte_start = byte_start + 4
-    byte_end = byte_end + 4
-
-    zone['ZoneType'] = construct.Int32ul.parse(
-        byte_list[byte_start:byte_end])
-
-    byte_start = byte_start + 4
-    byte_end = byte_end + 4
-
-    zone['VarLoc'] = construct.Int32ul.parse(
-        byte_list[byte_start:byte_end])
+    zone.update(zip(_ZONE_FIXED_FIELDS,
+                    _ZONE_FIXED.unpack_from(byte_list, byte_start)))
+    byte_start = byte_start + _ZONE_FIXED.size
 
     if zone['VarLoc'] == 1:
-        byte_start = byte_start + 4
-        byte_end = byte_end + 4
-        varLocs=[]
-        for i in range(num_vars):
-            byte_start = byte_start + i*4
-            byte_end = byte_end + i*4
-            varLocs.append(
-                           construct.Int32ul.parse(
-                           byte_list[byte_start:byte_end])
-                          )
-    byte_start = byte_start + 4
-    byte_end = byte_end + 4
-    zone['RawFaceNeighbors'] = construct.Int32ul.parse(
-        byte_list[byte_start:byte_end])
-
-
-    byte_start = byte_start + 4
-    byte_end = byte_end + 4
-    zone['UserdefinedFaceNeighbors'] = construct.Int32ul.parse(
-        byte_list[byte_start:byte_end])
-
-
-
-    if FeZone(zone['ZoneType']):
-        byte_start = byte_start + 4
-        byte_end = byte_end + 4
-        zone['RawFaceNeighbors'] = construct.Int32ul.parse(
-            byte_list[byte_start:byte_end])
-
-    if not FeZone(zone['ZoneType']):
-        byte_start = byte_start + 4
-        byte_end = byte_end + 4
-        zone['Imax'] = construct.Int32ul.parse(
-            byte_list[byte_start:byte_end])
-
-        byte_start = byte_start + 4
-        byte_end = byte_end + 4
-        zone['Jmax'] = construct.Int32ul.parse(
-            byte_list[byte_start:byte_end])
-
-        byte_start = byte_start + 4
-        byte_end = byte_end + 4
-        zone['Kmax'] = construct.Int32ul.parse(
-            byte_list[byte_start:byte_end])
-
-    byte_start = byte_start + 4
-    byte_end = byte_end + 4
-    zone['AuxdataNamePair'] = construct.Int32ul.parse(
-            byte_list[byte_start:byte_end])
+        var_locs = np.frombuffer(byte_list, dtype='<u4', count=num_vars,
+                                 offset=byte_start)
+        byte_start = byte_start + 4 * num_vars
+        zone['VarLocs'] = var_locs.tolist()
+
+    zone_tail, tail_fields = _ZONE_TAILS.get(zone['ZoneType'], _FE_ZONE_TAIL)
+    zone.update(zip(tail_fields, zone_tail.unpack_from(byte_list, byte_start)))
     return zone
 
 
 
 def find_zones(byte_list, eo_header):
-    counter = 0
-    end_of_header = False
-    zone_makers = list()
-    while not end_of_header:
-        first_byte = counter * 4
-        if first_byte >= eo_header:
-            end_of_header = True
-            continue
-
-        next_byte = (counter + 1) * 4
-        zone_marker = construct.Float32l.parse(byte_list[first_byte:next_byte])
-        if zone_marker == 299.0:
-            print('Zone Found')
-            print(first_byte)
-            zone_makers.append(first_byte)
-        counter = counter + 1
-
-    return zone_makers
+    num_words = eo_header // 4
+    return _find_markers(byte_list, _ZONE_MARKER, num_words, num_words)
 
 def find_end_of_header(byte_list):
-    end_of_header_found = False
-    counter = 0
-    while not end_of_header_found:
-        first_byte = counter * 4
-        eo_of_header_byte = first_byte +4
-        eof_value = construct.Float32l.parse(byte_list[first_byte:eo_of_header_byte])
-        if eof_value == 357.0:
-            end_of_header_found = True
-
-        counter = counter +1
-    return eo_of_header_byte
+    eoh_marker = _find_markers(byte_list, _EOH_MARKER, 1, len(byte_list) // 4)
+    return eoh_marker[0] + 4
 
 def read_header(byte_list):
     file_type_name=['FULL','GRID','SOLUTION']
+    # Zero-copy, read-only window over bytes, bytearray or mmap input;
+    # slicing it does not copy the tail.
+    mv = memoryview(byte_list).toreadonly()
 
-    magic_num = read_magic_number(byte_list[0:8])
+    magic_num = read_magic_number(mv[0:8])
     if not magic_num['Correct']:
         return {'Correct':False}
 
-    byte_order = construct.Int16sl.parse(byte_list[8:12])
-    file_type = construct.Int16sl.parse(byte_list[12:16])
-
+    byte_order, file_type = _FILE_PREAMBLE.unpack_from(mv, 8)
+    start = 8 + _FILE_PREAMBLE.size
 
     title=''
-    title_res = get_title(byte_list[16:])
+    title_res = get_title(mv, start)
     if title_res['Correct']:
         title=title_res['title']
+    start = start + title_res['next_byte']
 
+    num_vars = _I32.unpack_from(mv, start)[0]
+    start = start + 4
 
-    num_vars = construct.Int32sl.parse( byte_list[
-                                        title_res['next_byte']+16:
-                                        (title_res['next_byte']+20)])
-
-    start=title_res['next_byte']+20
-    var_names, next_byte = read_var_names(byte_list[start:],
-                               num_vars)
+    var_names, next_byte = read_var_names(mv, num_vars, start)
 
     start = start + next_byte
-    end_of_header = find_end_of_header(byte_list[start:])
+    end_of_header = find_end_of_header(mv[start:])
     end_of_header_abs = end_of_header + start
 
-    zone_markers= find_zones(byte_list[start:], end_of_header)
+    zone_markers= find_zones(mv[start:], end_of_header)
 
     zones=list()
     for zone in zone_markers:
-        zones.append(parse_zone(byte_list[start+zone+4:], var_names))
+        zones.append(parse_zone(mv, num_vars, start + zone + 4))
 
     # Now find and read zones
     #zones = find_zones(byte_list[next_byte+start:])
@@ -270,166 +251,297 @@ def read_header(byte_list):
             'Zones': zones}
 
 def find_zones_data(byte_list, num_zones, offset):
-    count_zones=0
-    counter = 0
-    all_zones_found = False
-    zone_makers = list()
-    while not all_zones_found:
-        first_byte = counter * 4
-        if count_zones == num_zones:
-            all_zones_found = True
-            continue
-
-        next_byte = (counter + 1) * 4
-        zone_marker = construct.Float32l.parse(byte_list[first_byte:next_byte])
-        if zone_marker == 299.0:
-            count_zones = count_zones + 1
-            zone_makers.append(first_byte+offset)
-        counter = counter + 1
-    return zone_makers
-
-
-def read_zones(byte_list, zone_markers, header, binary_file):
+    zone_makers = _find_markers(byte_list, _ZONE_MARKER, num_zones,
+                                len(byte_list) // 4)
+    return [zone_maker + offset for zone_maker in zone_makers]
+
+
+def _is_bf16(dtype):
+    return isinstance(dtype, str) and dtype == 'bf16'
+
+
+def _convert_block(block, dtype):
+    # Optionally trade precision for memory, e.g. np.float16. 'bf16' keeps
+    # the upper 16 bits of each float32 (truncating) and is returned as
+    # uint16. Min_Vals/Max_Vals are float64 in the file and are not affected.
+    if _is_bf16(dtype):
+        words = block.astype(np.float32, copy=False).view(np.uint32)
+        return (words >> 16).astype(np.uint16)
+    if np.dtype(dtype) == np.float32:
+        return block
+    return block.astype(dtype)
+
+
+_LAZY = object()
+
+
+class LazyZone(MutableMapping):
+    # Zone mapping whose variable arrays are only created from the buffer the
+    # first time they are looked up; until then their entry holds _LAZY. The
+    # variables of a zone are stored back to back, so each one is a slice of
+    # a single (num_vars, Kmax, Jmax, Imax) block starting at offset.
+    # zone.fields gives the same data as one structured record with a
+    # (Kmax, Jmax, Imax) field per variable, always in the file's float32
+    # precision.
+    def __init__(self, zone_data, byte_list, var_names, offset, dtype, shape,
+                 out_dtype=np.float32):
+        self._data = dict(zone_data)
+        self._data.update((name, _LAZY) for name in var_names)
+        self._byte_list = byte_list
+        self._var_names = list(var_names)
+        self._var_index = dict((name, i) for i, name in enumerate(var_names))
+        self._offset = offset
+        self._dtype = dtype
+        self._shape = (len(var_names),) + tuple(shape)
+        self._out_dtype = out_dtype
+        self._block = None
+        self._fields = None
+
+    @property
+    def block(self):
+        if self._block is None:
+            block = np.frombuffer(self._byte_list, dtype=self._dtype,
+                                  count=int(np.prod(self._shape)),
+                                  offset=self._offset)
+            # I varies fastest in the file, so this reshape is still a view.
+            block = block.reshape(self._shape)
+            self._block = _convert_block(block, self._out_dtype)
+        return self._block
+
+    @property
+    def fields(self):
+        if self._fields is None:
+            num_vars, shape = self._shape[0], self._shape[1:]
+            var_bytes = self._dtype.itemsize * int(np.prod(shape))
+            fields_dtype = np.dtype({
+                'names': self._var_names,
+                'formats': [(self._dtype, shape)] * num_vars,
+                'offsets': [i * var_bytes for i in range(num_vars)],
+                'itemsize': num_vars * var_bytes})
+            self._fields = np.frombuffer(self._byte_list, dtype=fields_dtype,
+                                         count=1, offset=self._offset)[0]
+        return self._fields
+
+    def _detach(self):
+        # Give the zone its own copy of its data block, so block, fields and
+        # the variables no longer view the caller's buffer. A reduced
+        # precision block is already converted into its own array, so only
+        # that is kept and fields still views the buffer. Only called before
+        # any variable has been looked up.
+        if (_is_bf16(self._out_dtype)
+                or np.dtype(self._out_dtype) != np.float32):
+            self.block
+            return
+        num_bytes = self._dtype.itemsize * int(np.prod(self._shape))
+        self._byte_list = np.frombuffer(self._byte_list, dtype=np.uint8,
+                                        count=num_bytes,
+                                        offset=self._offset).copy()
+        self._offset = 0
+        self._block = None
+        self._fields = None
+
+    def __getitem__(self, name):
+        data = self._data[name]
+        if data is _LAZY:
+            data = self.block[self._var_index[name]]
+            self._data[name] = data
+        return data
+
+    def __setitem__(self, name, value):
+        self._data[name] = value
+
+    def __delitem__(self, name):
+        del self._data[name]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, name):
+        return name in self._data
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def copy(self):
+        return dict(self)
+
+    def __reduce__(self):
+        # The buffer itself cannot be pickled, so a zone pickles (and deep
+        # copies) as a plain dict with every variable array created.
+        return dict, (dict(self),)
+
+
+def read_zone(byte_list, zone_marker, header, zone_index, dtype=np.float32):
     var_names = header['VarNames']
-    var_dict = {}
-    zone_vars = list()
-    start_byte = 0
-    zone_counter = 0
-    zones_list=[]
-    for zone in zone_markers:
-        zone_data={}
-        start_byte = zone + 4
-        var_dict = {}
-        for name in var_names:
-            end_byte = start_byte + 4
-            var_dict[name] = construct.Int32ul.parse(byte_list[start_byte:end_byte])
-            start_byte = end_byte
-        zone_data['VarDict'] = var_dict
-
-        zone_data['PassiveVars'] = construct.Int32ul.parse(byte_list[start_byte:start_byte + 4])
-        if zone_data['PassiveVars']  != 0:
-            passive_var_dict={}
-            for name in var_names:
-                end_byte = start_byte + 4
-                passive_var_dict[name] = construct.Int32ul.parse(byte_list[start_byte:end_byte])
-                start_byte = end_byte
-            zone_data['PassiveVarDict'] = passive_var_dict
-
-        zone_data['VarSharing'] = construct.Int32ul.parse(byte_list[start_byte:start_byte + 4])
-        if zone_data['VarSharing']  != 0:
-            share_var_dict={}
-            for name in var_names:
-                end_byte = start_byte + 4
-                share_var_dict[name] = construct.Int32ul.parse(byte_list[start_byte:end_byte])
-                start_byte = end_byte
-            zone_data['ShareVarDict'] = share_var_dict
-
-
-        zone_data['ConnSharing'] = construct.Int32ul.parse(byte_list[start_byte:start_byte + 4])
-        start_byte=start_byte+4
-        non_passive_non_shared = list()
-
-        if zone_data['VarSharing'] !=0:
-            for name in var_names:
-                if zone_data['ShareVarDict'][name] == 0:
-                    non_passive_non_shared.append(name)
-        else:
-            for name in var_names:
-                non_passive_non_shared.append(name)
-
-
-        if zone_data['PassiveVars'] !=0:
-            for name in var_names:
-                if zone_data['PassiveVarDict'][name] != 0:
-                    if name in non_passive_non_shared:
-                        non_passive_non_shared.remove(name)
-
-        min_val = {}
-        max_val = {}
-        start_byte=start_byte+4+4
-        for var_with_min_max in non_passive_non_shared:
-            end_byte = start_byte + 8
-            min_val[var_with_min_max] = construct.Float64l.parse(byte_list[start_byte:end_byte])
-            start_byte = end_byte
-
-            end_byte = start_byte + 8
-            max_val[var_with_min_max] = construct.Float64l.parse(byte_list[start_byte:end_byte])
-            start_byte = end_byte
-
-        print('start_data_list')
-        print(start_byte)
-
-        zone_data['Min_Vals'] = min_val
-        zone_data['Max_Vals'] = max_val
-
-        Imax = header['Zones'][zone_counter]['Imax']
-        Jmax = header['Zones'][zone_counter]['Jmax']
-        Kmax = header['Zones'][zone_counter]['Kmax']
-        print('Imax in read Zone')
-        print(Imax)
-        binary_file.seek(0)
-        print('NumValuesPerVariable')
-        print(Imax * Jmax * Kmax)
-
-
-
-
-        for name in var_names:
-            print('StartByte')
-            print(start_byte)
-            data = np.frombuffer(byte_list, dtype='float32',
-                                      count=Imax * Jmax * Kmax,
-                                      offset=start_byte)
-            start_byte = start_byte + 4 * Imax * Jmax * Kmax
-            zone_data[name] = data
-
-            #var_data=list()
-            #for I in range(0, Imax):
-            #    for J in range(0, Jmax):
-            #        for K in range(0, Kmax):
-            #            end_byte = start_byte + 4
-                        #print(byte_list[start_byte:end_byte])
-                        #print(construct.Float32l.parse(byte_list[start_byte:end_byte]))
-            #            var_data.append( construct.Float32b.parse(byte_list[start_byte:end_byte]))
-            #            start_byte = end_byte
-
-     #       for J in range(0, Jmax):
-     #           end_byte = start_byte + 4
-     #           #print(construct.Float32l.parse(byte_list[start_byte:end_byte]))
-     #           var_data.append(construct.Float32b.parse(byte_list[start_byte:end_byte]))
-     #           start_byte = end_byte
-
-     #       for K in range(0, Kmax):
-     #           end_byte = start_byte + 4
-     #           #print(construct.Float32l.parse(byte_list[start_byte:end_byte]))
-     #           var_data.append(construct.Float32b.parse(byte_list[start_byte:end_byte]))
-     #           start_byte = end_byte
-
-
-
-        zones_list.append(zone_data)
-
-        print('start_data_list')
-        print(start_byte)
-        zone_counter = zone_counter + 1
+    num_vars = len(var_names)
+    # Explicitly little endian, like every other field the reader parses.
+    data_dtype = np.dtype('<f4')
+    zone_data={}
+    start_byte = zone_marker + 4
+    var_dict = np.frombuffer(byte_list, dtype='<u4', count=num_vars,
+                             offset=start_byte)
+    start_byte = start_byte + 4 * num_vars
+    zone_data['VarDict'] = dict(zip(var_names, var_dict.tolist()))
+
+    zone_data['PassiveVars'] = _U32.unpack_from(byte_list, start_byte)[0]
+    start_byte = start_byte + 4
+    if zone_data['PassiveVars']  != 0:
+        passive_vars = np.frombuffer(byte_list, dtype='<u4',
+                                     count=num_vars, offset=start_byte)
+        start_byte = start_byte + 4 * num_vars
+        zone_data['PassiveVarDict'] = dict(zip(var_names,
+                                               passive_vars.tolist()))
+
+    zone_data['VarSharing'] = _U32.unpack_from(byte_list, start_byte)[0]
+    start_byte = start_byte + 4
+    if zone_data['VarSharing']  != 0:
+        share_vars = np.frombuffer(byte_list, dtype='<u4',
+                                   count=num_vars, offset=start_byte)
+        start_byte = start_byte + 4 * num_vars
+        zone_data['ShareVarDict'] = dict(zip(var_names,
+                                             share_vars.tolist()))
+
+
+    zone_data['ConnSharing'] = _U32.unpack_from(byte_list, start_byte)[0]
+    start_byte=start_byte+4
+
+    # Min/max values are only stored for variables that are neither
+    # shared with another zone nor passive.
+    has_min_max = np.ones(num_vars, dtype=bool)
+    if zone_data['VarSharing'] !=0:
+        has_min_max &= share_vars == 0
+    if zone_data['PassiveVars'] !=0:
+        has_min_max &= passive_vars == 0
+    non_passive_non_shared = [var_names[i]
+                              for i in np.flatnonzero(has_min_max)]
+
+    min_max = np.frombuffer(byte_list, dtype='<f8',
+                            count=2 * len(non_passive_non_shared),
+                            offset=start_byte).reshape(-1, 2)
+    start_byte = start_byte + 16 * len(non_passive_non_shared)
+    min_val = dict(zip(non_passive_non_shared, min_max[:, 0].tolist()))
+    max_val = dict(zip(non_passive_non_shared, min_max[:, 1].tolist()))
+
+    zone_data['Min_Vals'] = min_val
+    zone_data['Max_Vals'] = max_val
+
+    Imax = header['Zones'][zone_index]['Imax']
+    Jmax = header['Zones'][zone_index]['Jmax']
+    Kmax = header['Zones'][zone_index]['Kmax']
+
+    shape = (Kmax, Jmax, Imax)
+    return LazyZone(zone_data, byte_list, var_names, start_byte, data_dtype,
+                    shape, dtype)
+
+
+def iter_zones(byte_list, zone_markers, header, dtype=np.float32,
+               release=False):
+    # Yield the zones one at a time, so a caller that handles them in turn
+    # never keeps more than one alive. zone_markers may be None to find them
+    # the way read_data does. With release=True and an mmap, the
+    # pages of each zone are dropped once the next one is requested; they
+    # are read back from the file if that zone is touched again.
+    mm = byte_list if isinstance(byte_list, mmap.mmap) else None
+    if mm is not None and hasattr(mmap, 'MADV_SEQUENTIAL'):
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+    release = release and mm is not None and hasattr(mmap, 'MADV_DONTNEED')
+    mv = memoryview(byte_list).toreadonly()
+    if zone_markers is None:
+        eo_header = header['EofHeader']
+        zone_markers = find_zones_data(mv[eo_header:],
+                                       len(header['ZoneMarkers']), eo_header)
+
+    released = 0
+    for zone_index, zone_marker in enumerate(zone_markers):
+        if release:
+            # madvise needs a page aligned start; rounding down keeps the
+            # pages of the current zone mapped.
+            page_start = zone_marker - zone_marker % mmap.PAGESIZE
+            if page_start > released:
+                mm.madvise(mmap.MADV_DONTNEED, released, page_start - released)
+                released = page_start
+        yield read_zone(mv, zone_marker, header, zone_index, dtype)
+
+
+def read_zones(byte_list, zone_markers, header, copy=False, max_workers=None,
+               dtype=np.float32):
+    # The zone arrays are views onto this, so they can never write through
+    # to the caller's buffer.
+    byte_list = memoryview(byte_list).toreadonly()
+    zones_list = list(iter_zones(byte_list, zone_markers, header, dtype))
+
+    # The zones above view byte_list. If asked, give each its own copy of
+    # its data block on a thread pool; NumPy releases the GIL while copying.
+    if copy:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(LazyZone._detach, zones_list))
 
     return zones_list
 
 
-def read_data(byte_list, header, binary_file):
+def read_data(byte_list, header, copy=False, max_workers=None,
+              dtype=np.float32):
+    if isinstance(byte_list, mmap.mmap) and hasattr(mmap, 'MADV_SEQUENTIAL'):
+        byte_list.madvise(mmap.MADV_SEQUENTIAL)
+    mv = memoryview(byte_list).toreadonly()
     eo_header = header['EofHeader']
     num_zones = len(header['ZoneMarkers'])
-    zone_markers = find_zones_data(byte_list[eo_header:], num_zones, eo_header)
-
-    zones_list = read_zones(byte_list, zone_markers, header, binary_file)
-
-
-    print('len_byte_list')
-    print(len(byte_list))
+    zone_markers = find_zones_data(mv[eo_header:], num_zones, eo_header)
 
+    zones_list = read_zones(mv, zone_markers, header, copy, max_workers,
+                            dtype)
 
     return {'ZoneMarkers':zone_markers,
             'Zones':zones_list}
 
 
-
+def read_plt(path):
+    # Read the whole file into one preallocated buffer in large chunks, so
+    # there is no per-chunk bytes object and no final concatenation copy.
+    with open(path, 'rb', buffering=0) as binary_file:
+        fd = binary_file.fileno()
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        byte_list = bytearray(os.fstat(fd).st_size)
+        num_bytes = 0
+        with memoryview(byte_list) as mv:
+            while num_bytes < len(byte_list):
+                num_read = binary_file.readinto(
+                    mv[num_bytes:num_bytes + _READ_CHUNK])
+                if not num_read:
+                    break
+                num_bytes = num_bytes + num_read
+        del byte_list[num_bytes:]
+    return byte_list
+
+
+def open_plt(path):
+    # Map the file read-only instead of reading it. read_header/read_data
+    # accept the mapping directly and the zone arrays are views onto it,
+    # so pages are only loaded from disk when they are touched.
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+
+
+def read_plt_file(path):
+    # Parse a whole file through a read-only mapping; returns the header
+    # and data dicts of read_header and read_data.
+    mm = open_plt(path)
+    header = read_header(mm)
+    return header, read_data(mm, header)
+
+
+# Use the compiled scanners from tecplotPltReader_c.pyx when they are built,
+# keeping the Python ones reachable for the fallback and parity tests.
+_py_get_title, _py_find_markers = get_title, _find_markers
+try:
+    from tecplotPltReader_c import get_title, _find_markers
+    _HAVE_CYTHON = True
+except ImportError:
+    _HAVE_CYTHON = False
@@ -1,6 +1,60 @@
+import copy
+import mmap
+import os
+import pickle
+import struct
+import tempfile
 import unittest
+from unittest import mock
+import numpy as np
 import tecplotPltReader
-import construct
+
+
+def tec_str(text):
+    return b''.join(struct.pack('<i', ord(c)) for c in text) + struct.pack('<i', 0)
+
+
+def build_plt(var_names, zones, title='Test'):
+    header = b'#!TDV112' + struct.pack('<ii', 1, 0) + tec_str(title)
+    header += struct.pack('<i', len(var_names))
+    for name in var_names:
+        header += tec_str(name)
+    for zone in zones:
+        i_max, j_max, k_max = zone['shape']
+        header += struct.pack('<f', 299.0) + tec_str(zone['name'])
+        header += struct.pack('<iidiiiii', -1, -1, zone['time'], -1, 0, 0, 0, 0)
+        header += struct.pack('<iiii', i_max, j_max, k_max, 0)
+    header += struct.pack('<f', 357.0)
+
+    data = b''
+    for zone in zones:
+        data += struct.pack('<f', 299.0)
+        data += struct.pack('<%di' % len(var_names), *([1] * len(var_names)))
+        passive = zone.get('passive', [0] * len(var_names))
+        share = zone.get('share', [0] * len(var_names))
+        for flags in (passive, share):
+            data += struct.pack('<i', int(any(flags)))
+            if any(flags):
+                data += struct.pack('<%di' % len(var_names), *flags)
+        data += struct.pack('<i', -1)
+        for i, name in enumerate(var_names):
+            if passive[i] or share[i]:
+                continue
+            values = zone['data'][name]
+            data += struct.pack('<dd', float(values.min()), float(values.max()))
+        for name in var_names:
+            data += zone['data'][name].astype('<f4').tobytes()
+    return header + data
+
+
+def sample_plt():
+    values = np.arange(6, dtype='float32')
+    zones = [{'name': 'Z1', 'shape': (3, 2, 1), 'time': 0.5,
+              'data': {'X': values, 'Y': values * 2, 'P': values - 1}},
+             {'name': 'Z2', 'shape': (2, 2, 1), 'time': 1.5,
+              'data': {'X': values[:4], 'Y': values[:4] + 5,
+                       'P': values[:4] * 3}}]
+    return build_plt(['X', 'Y', 'P'], zones), zones
 
 
 class TestStringMethods(unittest.TestCase):
@@ -21,6 +75,14 @@ class TestStringMethods(unittest.TestCase):
         self.assertEqual(qword_res['Correct'],True)
         self.assertEqual(qword_res['tec_str'], '..')
 
+    def test_read_tec_str(self):
+        self.assertEqual(tecplotPltReader.read_tec_str(b"\x2e\x00\x00\x00"),
+                         (True, '.', False))
+        end = tecplotPltReader.read_tec_str(b"\x00\x00\x00\x00")
+        self.assertTrue(end.correct)
+        self.assertTrue(end.end)
+        self.assertFalse(tecplotPltReader.read_tec_str(b"\x2e").correct)
+
     def test_read_magic_number(self):
         #[hex(0x12345678 >> i & 0xff) for i in (24, 16, 8, 0)]
         mag_res = tecplotPltReader.read_magic_number(b"\x23\x21\x54\x44\x56\x31\x31\x32")
@@ -46,6 +108,265 @@ class TestStringMethods(unittest.TestCase):
         self.assertEqual(mag_res['NumVars'], 47)
         self.assertEqual(mag_res['Title'], '...')
 
+    def test_parse_zone_var_locs(self):
+        byte_list = (b'\x00' * 8 + tec_str('Z1')
+                     + struct.pack('<iidiii', -1, -1, 2.5, -1, 0, 1)
+                     + struct.pack('<iii', 0, 1, 1)
+                     + struct.pack('<iiiiii', 0, 0, 4, 5, 6, 0))
+        zone = tecplotPltReader.parse_zone(byte_list, 3, 8)
+        self.assertEqual(zone['ZoneName'], 'Z1')
+        self.assertEqual(zone['SolutionTime'], 2.5)
+        self.assertEqual(zone['VarLocs'], [0, 1, 1])
+        self.assertEqual((zone['Imax'], zone['Jmax'], zone['Kmax']), (4, 5, 6))
+
+    def test_parse_zone_fe_tail(self):
+        byte_list = (tec_str('Z1')
+                     + struct.pack('<iidiii', -1, -1, 0.0, -1, 3, 0)
+                     + struct.pack('<iiii', 1, 2, 3, 0))
+        zone = tecplotPltReader.parse_zone(byte_list, 3)
+        self.assertEqual(zone['RawFaceNeighbors'], 3)
+        self.assertEqual(zone['UserdefinedFaceNeighbors'], 2)
+        self.assertEqual(zone['AuxdataNamePair'], 0)
+
+    def test_read_data(self):
+        byte_list, zones = sample_plt()
+        header = tecplotPltReader.read_header(byte_list)
+        self.assertEqual(header['VarNames'], ['X', 'Y', 'P'])
+        self.assertEqual(len(header['Zones']), 2)
+        self.assertEqual(header['Zones'][0]['ZoneName'], 'Z1')
+        self.assertEqual(header['Zones'][1]['Imax'], 2)
+
+        data = tecplotPltReader.read_data(byte_list, header)
+        self.assertEqual(len(data['Zones']), 2)
+        for zone, expected in zip(data['Zones'], zones):
+            self.assertEqual(zone['VarDict'], {'X': 1, 'Y': 1, 'P': 1})
+            self.assertEqual(zone['ConnSharing'], 0xFFFFFFFF)
+            for name, values in expected['data'].items():
+                self.assertEqual(zone['Min_Vals'][name], values.min())
+                self.assertEqual(zone['Max_Vals'][name], values.max())
+                self.assertEqual(zone[name].dtype, np.dtype('<f4'))
+                self.assertEqual(zone[name].shape, expected['shape'][::-1])
+                self.assertFalse(zone[name].flags.owndata)
+                np.testing.assert_array_equal(zone[name].ravel(), values)
+
+    def test_read_data_passive_and_shared(self):
+        values = np.arange(6, dtype='float32')
+        zones = [{'name': 'Z1', 'shape': (3, 2, 1), 'time': 0.5,
+                  'passive': [0, 1, 0], 'share': [0, 0, 1],
+                  'data': {'X': values, 'Y': values * 2, 'P': values - 1}}]
+        byte_list = build_plt(['X', 'Y', 'P'], zones)
+        header = tecplotPltReader.read_header(byte_list)
+        zone = tecplotPltReader.read_data(byte_list, header)['Zones'][0]
+        self.assertEqual(zone['PassiveVarDict'], {'X': 0, 'Y': 1, 'P': 0})
+        self.assertEqual(zone['ShareVarDict'], {'X': 0, 'Y': 0, 'P': 1})
+        self.assertEqual(zone['Min_Vals'], {'X': 0.0})
+        self.assertEqual(zone['Max_Vals'], {'X': 5.0})
+        np.testing.assert_array_equal(zone['X'].ravel(), values)
+
+    def test_read_data_lazy_variables(self):
+        byte_list, zones = sample_plt()
+        header = tecplotPltReader.read_header(byte_list)
+        zone = tecplotPltReader.read_data(byte_list, header)['Zones'][0]
+        self.assertEqual(list(zone.keys())[-3:], ['X', 'Y', 'P'])
+        self.assertIn('P', zone)
+        self.assertIsNone(zone._block)
+        self.assertIs(zone['P'], zone.get('P'))
+        self.assertIsNotNone(zone._block)
+        self.assertIsNone(zone.get('Q'))
+        self.assertEqual(zone.block.shape, (3, 1, 2, 3))
+        self.assertTrue(np.shares_memory(zone.block, zone['X']))
+        np.testing.assert_array_equal(zone.block[2], zone['P'])
+        with self.assertRaises(KeyError):
+            zone['Q']
+
+    def test_read_data_zone_mapping(self):
+        byte_list, zones = sample_plt()
+        header = tecplotPltReader.read_header(byte_list)
+        zone = tecplotPltReader.read_data(byte_list, header)['Zones'][0]
+        expected = zones[0]['data']
+        items = dict(zone.items())
+        self.assertEqual(len(zone), len(items))
+        self.assertEqual(list(zone), list(items))
+        for name, values in expected.items():
+            np.testing.assert_array_equal(items[name].ravel(), values)
+            np.testing.assert_array_equal(zone.copy()[name].ravel(), values)
+        for restored in (pickle.loads(pickle.dumps(zone)),
+                         copy.deepcopy(zone)):
+            self.assertEqual(list(restored), list(zone))
+            np.testing.assert_array_equal(restored['Y'].ravel(),
+                                          expected['Y'])
+        np.testing.assert_array_equal(zone.pop('X').ravel(), expected['X'])
+        self.assertNotIn('X', zone)
+        self.assertEqual(len(zone), len(items) - 1)
+
+    def test_read_data_reduced_precision(self):
+        byte_list, zones = sample_plt()
+        header = tecplotPltReader.read_header(byte_list)
+        half = tecplotPltReader.read_data(byte_list, header,
+                                          dtype=np.float16)['Zones'][0]
+        self.assertEqual(half['Y'].dtype, np.float16)
+        np.testing.assert_array_equal(half['Y'].ravel(),
+                                      zones[0]['data']['Y'])
+        self.assertEqual(half['Max_Vals']['Y'], 10.0)
+
+        bf16 = tecplotPltReader.read_data(byte_list, header,
+                                          dtype='bf16')['Zones'][0]
+        self.assertEqual(bf16['Y'].dtype, np.uint16)
+        restored = (bf16['Y'].astype(np.uint32) << 16).view(np.float32)
+        np.testing.assert_array_equal(restored.ravel(), zones[0]['data']['Y'])
+
+    def test_read_data_fields(self):
+        byte_list, zones = sample_plt()
+        header = tecplotPltReader.read_header(byte_list)
+        zone = tecplotPltReader.read_data(byte_list, header)['Zones'][1]
+        fields = zone.fields
+        self.assertEqual(fields.dtype.names, ('X', 'Y', 'P'))
+        self.assertEqual(fields['Y'].shape, (1, 2, 2))
+        self.assertTrue(np.shares_memory(fields['Y'], zone['Y']))
+        np.testing.assert_array_equal(fields[['X', 'P']]['P'], zone['P'])
+
+        values = np.arange(4, dtype='float32')
+        byte_list = build_plt(['Fields', 'Y'], [
+            {'name': 'Z1', 'shape': (2, 2, 1), 'time': 0.0,
+             'data': {'Fields': values, 'Y': values + 1}}])
+        header = tecplotPltReader.read_header(byte_list)
+        zone = tecplotPltReader.read_data(byte_list, header)['Zones'][0]
+        np.testing.assert_array_equal(zone['Fields'].ravel(), values)
+        np.testing.assert_array_equal(zone.fields['Y'].ravel(), values + 1)
+
+    def test_find_markers_without_numba(self):
+        byte_list, _ = sample_plt()
+        header = tecplotPltReader.read_header(byte_list)
+        with mock.patch.object(tecplotPltReader, '_HAVE_NUMBA', False), \
+                mock.patch.object(tecplotPltReader, 'get_title',
+                                  tecplotPltReader._py_get_title), \
+                mock.patch.object(tecplotPltReader, '_find_markers',
+                                  tecplotPltReader._py_find_markers), \
+                mock.patch.object(tecplotPltReader, '_SCAN_CHUNK', 3), \
+                mock.patch.object(tecplotPltReader, '_TITLE_WINDOW', 1):
+            fallback = tecplotPltReader.read_header(byte_list)
+            self.assertEqual(tecplotPltReader.get_title(byte_list, 16)['title'],
+                             'Test')
+        self.assertEqual(fallback['EofHeader'], header['EofHeader'])
+        self.assertEqual(fallback['ZoneMarkers'], header['ZoneMarkers'])
+        self.assertEqual(fallback['Zones'], header['Zones'])
+
+
+    @unittest.skipUnless(tecplotPltReader._HAVE_CYTHON,
+                         'tecplotPltReader_c is not built')
+    def test_compiled_scanners_match_python(self):
+        byte_list, _ = sample_plt()
+        num_words = len(byte_list) // 4
+        for have_numba in sorted({False, tecplotPltReader._HAVE_NUMBA}):
+            with mock.patch.object(tecplotPltReader, '_HAVE_NUMBA',
+                                   have_numba):
+                for offset in (16, 40, len(byte_list) - 4):
+                    self.assertEqual(
+                        tecplotPltReader.get_title(byte_list, offset),
+                        tecplotPltReader._py_get_title(byte_list, offset))
+                for marker in (299.0, 357.0):
+                    for max_count in (0, 1, num_words):
+                        self.assertEqual(
+                            tecplotPltReader._find_markers(
+                                byte_list, marker, max_count, num_words),
+                            tecplotPltReader._py_find_markers(
+                                byte_list, marker, max_count, num_words))
+
+    def test_read_plt(self):
+        byte_list, _ = sample_plt()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'sample.plt')
+            with open(path, 'wb') as plt_file:
+                plt_file.write(byte_list)
+            with mock.patch.object(tecplotPltReader, '_READ_CHUNK', 7):
+                loaded = tecplotPltReader.read_plt(path)
+        self.assertEqual(loaded, byte_list)
+        header = tecplotPltReader.read_header(loaded)
+        zone = tecplotPltReader.read_data(loaded, header)['Zones'][0]
+        self.assertFalse(zone['X'].flags.writeable)
+
+
+    def test_read_plt_file(self):
+        byte_list, zones = sample_plt()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'sample.plt')
+            with open(path, 'wb') as plt_file:
+                plt_file.write(byte_list)
+            header, data = tecplotPltReader.read_plt_file(path)
+        self.assertEqual(header['VarNames'], ['X', 'Y', 'P'])
+        for zone, expected in zip(data['Zones'], zones):
+            for name, values in expected['data'].items():
+                np.testing.assert_array_equal(zone[name].ravel(), values)
+
+
+    def test_iter_zones(self):
+        byte_list, zones = sample_plt()
+        header = tecplotPltReader.read_header(byte_list)
+        iterated = tecplotPltReader.iter_zones(byte_list, None, header)
+        for zone, expected in zip(iterated, zones):
+            for name, values in expected['data'].items():
+                np.testing.assert_array_equal(zone[name].ravel(), values)
+
+    @unittest.skipUnless(hasattr(mmap, 'MADV_DONTNEED'), 'needs MADV_DONTNEED')
+    def test_iter_zones_release(self):
+        class TrackedMmap(mmap.mmap):
+            def madvise(self, option, *args):
+                if option == mmap.MADV_DONTNEED:
+                    released.append(args)
+                return mmap.mmap.madvise(self, option, *args)
+
+        # Each zone spans several pages, so earlier zones can be released.
+        # Fractional values keep the 299.0 zone marker out of the data.
+        values = np.arange(mmap.PAGESIZE, dtype='float32') / mmap.PAGESIZE
+        zones = [{'name': 'Z%d' % i, 'shape': (values.size, 1, 1),
+                  'time': float(i), 'data': {'X': values + i, 'Y': values - i}}
+                 for i in range(3)]
+        byte_list = build_plt(['X', 'Y'], zones)
+        released = list()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'sample.plt')
+            with open(path, 'wb') as plt_file:
+                plt_file.write(byte_list)
+            with open(path, 'rb') as plt_file:
+                mm = TrackedMmap(plt_file.fileno(), 0, access=mmap.ACCESS_READ)
+            header = tecplotPltReader.read_header(mm)
+            iterated = list(tecplotPltReader.iter_zones(mm, None, header,
+                                                        release=True))
+            self.assertEqual(len(released), 2)
+            for start, length in released:
+                self.assertEqual(start % mmap.PAGESIZE, 0)
+                self.assertGreater(length, 0)
+            # The released pages are read back from the file.
+            for zone, expected in zip(iterated, zones):
+                for name, values in expected['data'].items():
+                    np.testing.assert_array_equal(zone[name].ravel(), values)
+            del zone, iterated
+            mm.close()
+
+    def test_read_data_copy(self):
+        byte_list, zones = sample_plt()
+        header = tecplotPltReader.read_header(byte_list)
+        data = tecplotPltReader.read_data(byte_list, header, copy=True, max_workers=2)
+        buffer = np.frombuffer(byte_list, dtype=np.uint8)
+        for zone, expected in zip(data['Zones'], zones):
+            for name, values in expected['data'].items():
+                self.assertTrue(zone[name].flags.writeable)
+                self.assertFalse(np.shares_memory(zone[name], buffer))
+                np.testing.assert_array_equal(zone[name].ravel(), values)
+            self.assertTrue(np.shares_memory(zone.fields, zone.block))
+            self.assertFalse(np.shares_memory(zone.fields, buffer))
+
+        data = tecplotPltReader.read_data(byte_list, header, copy=True,
+                                          dtype=np.float16)
+        for zone, expected in zip(data['Zones'], zones):
+            self.assertEqual(zone.block.dtype, np.float16)
+            self.assertFalse(np.shares_memory(zone.block, buffer))
+            # No float32 copy is kept next to the float16 block.
+            self.assertTrue(np.shares_memory(zone.fields, buffer))
+            for name, values in expected['data'].items():
+                self.assertTrue(zone[name].flags.writeable)
+                np.testing.assert_array_equal(zone[name].ravel(), values)
+
 
 if __name__ == '__main__':
     unittest.main()
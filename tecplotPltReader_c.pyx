@@ -0,0 +1,49 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+# Compiled versions of the scanning loops of tecplotPltReader.
+# Build in place with:  cythonize -i tecplotPltReader_c.pyx
+import struct
+
+
+cdef inline unsigned int _u32(const unsigned char* p) nogil:
+    return (p[0] | (p[1] << 8) | (p[2] << 16)
+            | (<unsigned int>p[3] << 24))
+
+
+def get_title(byte_list, Py_ssize_t offset=0):
+    cdef const unsigned char[::1] buf = byte_list
+    cdef Py_ssize_t num_bytes = buf.shape[0]
+    cdef Py_ssize_t pos = offset
+    cdef Py_ssize_t num_chars, i
+    cdef unsigned char* out
+
+    while pos + 4 <= num_bytes and _u32(&buf[pos]) != 0:
+        pos += 4
+    if pos + 4 > num_bytes:
+        return {'Correct': False}
+
+    num_chars = (pos - offset) // 4
+    title = bytearray(num_chars)
+    out = title
+    for i in range(num_chars):
+        out[i] = buf[offset + 4 * i]
+
+    return {'Correct': True, 'title': title.decode('latin-1'),
+            'next_byte': pos + 4 - offset}
+
+
+def _find_markers(byte_list, marker, Py_ssize_t max_count,
+                  Py_ssize_t num_words):
+    cdef const unsigned char[::1] buf = byte_list
+    cdef unsigned int marker_bits = struct.unpack(
+        '<I', struct.pack('<f', marker))[0]
+    cdef Py_ssize_t i, count = 0
+    markers = list()
+
+    num_words = min(num_words, buf.shape[0] // 4)
+    for i in range(num_words):
+        if count == max_count:
+            break
+        if _u32(&buf[4 * i]) == marker_bits:
+            markers.append(4 * i)
+            count += 1
+    return markers